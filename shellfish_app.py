@@ -13,15 +13,22 @@ Features:
 import streamlit as st
 import pandas as pd
 import numpy as np
-from scipy.special import gammaln
-from scipy.stats import fisk  # fisk IS the log-logistic distribution
+from scipy.special import gammaln, ndtr, ndtri
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from plotly.colors import qualitative
 import os
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import io
+import importlib.util
+import operator
 from datetime import datetime
+from collections import defaultdict
+from time import perf_counter_ns
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 import tempfile
 
 # ============================================================================
@@ -45,6 +52,9 @@ PROPORTION_SUSCEPTIBLE = 0.74
 PR_ILLNESS_GIVEN_INFECTION = 0.6
 PR_ILLNESS = PROPORTION_SUSCEPTIBLE * PR_ILLNESS_GIVEN_INFECTION
 
+# Dose-independent part of the Beta-Binomial log-probability: gammaln(a + b) - gammaln(b)
+LOG_DOSE_RESPONSE_CONST = gammaln(ALPHA + BETA) - gammaln(BETA)
+
 # Meal size distribution parameters (LogLogistic from Excel BAF sheet)
 MEAL_SIZE_A = 2.2046
 MEAL_SIZE_B = 75.072
@@ -52,67 +62,192 @@ MEAL_SIZE_G = -0.9032
 MEAL_SIZE_MIN = 5.0   # Truncation limits
 MEAL_SIZE_MAX = 800.0
 
+# LogLogistic CDF at the truncation limits and inverse shape, for inverse-CDF sampling
+# F(x) = 1 / (1 + (B / (x - G))^A)
+MEAL_SIZE_CDF_MIN = 1.0 / (1.0 + (MEAL_SIZE_B / (MEAL_SIZE_MIN - MEAL_SIZE_G)) ** MEAL_SIZE_A)
+MEAL_SIZE_CDF_MAX = 1.0 / (1.0 + (MEAL_SIZE_B / (MEAL_SIZE_MAX - MEAL_SIZE_G)) ** MEAL_SIZE_A)
+MEAL_SIZE_INV_A = 1.0 / MEAL_SIZE_A
+
 # BAF distribution parameters (example - can be customized)
 BAF_MEAN = 18.5
 BAF_STD = 5.2  # Standard deviation
+BAF_MIN = 1.0  # Lower truncation limit
+
+# Model configuration: hardcoded to David's preferred methods
+USE_VARIABLE_MEAL = True  # LogLogistic meal size
+USE_VARIABLE_BAF = False  # Fixed BAF = 18.5
+USE_HOCKEY_STICK = True   # Hockey-stick for effluent (David's method)
+
+# Seed for the shared random generator: set QMRA_SEED for reproducible runs (unset = fresh entropy)
+RNG_SEED = None
+if os.environ.get('QMRA_SEED'):
+    try:
+        RNG_SEED = int(os.environ['QMRA_SEED'])
+        if RNG_SEED < 0:
+            raise ValueError
+    except ValueError:
+        # Bad value: run unseeded rather than failing the page at import
+        RNG_SEED = None
+        st.warning(f"⚠️ Ignoring QMRA_SEED={os.environ['QMRA_SEED']!r} - it must be a non-negative "
+                   f"integer. Runs use fresh entropy and are not reproducible.")
+
+# Precision of the large per-person Monte Carlo arrays (QMRA needs ~3 significant figures)
+# The dose-response itself is evaluated in float64 (difference of large log-gammas)
+MC_DTYPE = np.float32
+
+# Per-person elements (iterations x people) processed per cache block
+MC_BLOCK_ELEMENTS = 2 ** 17
+
+# Smallest iteration chunk worth handing to its own thread
+MIN_ITERATIONS_PER_WORKER = 2500
 
 # ============================================================================
 # FUNCTIONS
 # ============================================================================
 
-def beta_binomial_infection_prob(dose, alpha=ALPHA, beta=BETA):
-    """Calculate infection probability using Beta-Binomial model"""
-    dose = np.atleast_1d(dose).astype(float)
-    log_prob_complement = (
-        gammaln(beta + dose) +
-        gammaln(alpha + beta) -
-        gammaln(alpha + beta + dose) -
-        gammaln(beta)
-    )
-    prob = 1.0 - np.exp(log_prob_complement)
-    prob = np.maximum(prob, 0.0)
-    prob = np.minimum(prob, 1.0)
-    return prob
+class PhaseTimer:
+    """
+    Accumulate wall-clock time per named phase of a run
 
+    Each lap(name) charges the time since the previous lap (or creation) to
+    that phase, so the simulation hot path can be profiled without nesting.
+    """
 
-def discretize_dose(dose):
-    """Discretize fractional doses using Excel's INT + Binomial method"""
-    dose = np.atleast_1d(dose).astype(float)
-    integer_part = np.floor(dose).astype(int)
-    fractional_part = dose - integer_part
-    fractional_organisms = np.random.binomial(1, fractional_part)
-    discretized = integer_part + fractional_organisms
-    return discretized
+    def __init__(self):
+        self.ns = defaultdict(int)
+        self._last = perf_counter_ns()
+
+    def reset(self):
+        """Restart the clock without charging the elapsed time to any phase"""
+        self._last = perf_counter_ns()
 
+    def lap(self, name):
+        now = perf_counter_ns()
+        self.ns[name] += now - self._last
+        self._last = now
 
-def sample_meal_size_loglogistic(n_samples):
+    def to_dataframe(self):
+        total = sum(self.ns.values()) or 1
+        return pd.DataFrame({
+            'Phase': list(self.ns),
+            'Time (ms)': [ns / 1e6 for ns in self.ns.values()],
+            'Share (%)': [100.0 * ns / total for ns in self.ns.values()],
+        })
+
+
+class Scratch:
     """
-    Sample meal sizes from LogLogistic distribution (from Excel BAF sheet)
-    Truncated between 5g and 800g
+    Reusable (rows, num_people) work buffers for simulate_population
 
-    Note: scipy.stats.fisk IS the log-logistic distribution
-    Parameters: shape=a, loc=g, scale=b
+    One instance is shared by every cache block of a run (and one per worker
+    thread), so the per-person dose, uniform and infection arrays are
+    allocated once instead of once per block.
     """
-    samples = []
-    while len(samples) < n_samples:
-        # fisk.rvs(c, loc, scale) where c is shape parameter
-        sample = fisk.rvs(MEAL_SIZE_A, loc=MEAL_SIZE_G, scale=MEAL_SIZE_B)
-        if MEAL_SIZE_MIN <= sample <= MEAL_SIZE_MAX:
-            samples.append(sample)
-    return np.array(samples[:n_samples])
 
+    def __init__(self, rows, num_people):
+        self.dose = np.empty((rows, num_people), dtype=MC_DTYPE)
+        self.uniform = np.empty((rows, num_people), dtype=MC_DTYPE)
+        self.infected = np.empty((rows, num_people), dtype=bool)
 
-def sample_baf(n_samples, mean=BAF_MEAN, std=BAF_STD):
+    def view(self, rows):
+        """Leading-rows views (still C-contiguous) for a block of `rows` iterations"""
+        return self.dose[:rows], self.uniform[:rows], self.infected[:rows]
+
+
+@st.cache_resource
+def get_rng(seed=RNG_SEED):
+    """
+    Shared numpy Generator (PCG64) for all Monte Carlo sampling
+
+    Note: Cached as a resource - one persistent generator across Streamlit reruns
+    instead of re-seeding (or using the legacy global np.random state) each run
+    """
+    return np.random.default_rng(seed)
+
+
+def beta_binomial_infection_prob(dose, alpha=ALPHA, beta=BETA):
+    """Calculate infection probability using Beta-Binomial model"""
+    dose = np.atleast_1d(dose)
+
+    # Discretized doses are small non-negative integers repeated many times:
+    # evaluate once per possible dose 0..max and gather, instead of 2 gammaln per element
+    if np.issubdtype(dose.dtype, np.integer) and dose.size > 0:
+        max_dose = dose.max()
+        if max_dose < dose.size and dose.min() >= 0:
+            table = beta_binomial_infection_prob(np.arange(max_dose + 1, dtype=np.float64), alpha, beta)
+            return table[dose]
+
+    # gammaln(alpha + beta) - gammaln(beta) does not depend on dose (precomputed for the defaults)
+    if alpha == ALPHA and beta == BETA:
+        log_const = LOG_DOSE_RESPONSE_CONST
+    else:
+        log_const = gammaln(alpha + beta) - gammaln(beta)
+    # Evaluate the chain in two float64 buffers (in-place ufuncs, no extra temporaries)
+    shifted = np.add(dose, beta, dtype=np.float64)  # beta + dose
+    prob = gammaln(shifted)
+    shifted += alpha  # alpha + beta + dose
+    prob -= gammaln(shifted, out=shifted)
+    prob += log_const
+    np.exp(prob, out=prob)
+    np.subtract(1.0, prob, out=prob)
+    return np.clip(prob, 0.0, 1.0, out=prob)
+
+
+def discretize_dose(dose, rng=None):
+    """Discretize fractional doses using Excel's INT + Binomial method"""
+    if rng is None:
+        rng = get_rng()
+    dose = np.atleast_1d(dose)
+    dose = dose.astype(np.result_type(dose, MC_DTYPE), copy=False)  # keep float32 input as float32
+    # INT(d) + Bernoulli(d - INT(d)) fused into one pass as floor(d + u), u ~ U[0, 1):
+    # floor(d + u) = INT(d) + 1 exactly when u >= 1 - frac(d), which has probability frac(d)
+    # (up to float rounding of d + u, < 1e-3 organisms for float32 doses below 16384)
+    discretized = rng.random(dose.shape, dtype=dose.dtype)
+    discretized += dose
+    np.floor(discretized, out=discretized)
+    return discretized.astype(int)
+
+
+def sample_meal_size_loglogistic(n_samples, rng=None):
+    """
+    Sample meal sizes from LogLogistic distribution (from Excel BAF sheet)
+    Truncated between 5g and 800g
+
+    Uses inverse-CDF sampling on the truncated range: draw u uniformly
+    between F(min) and F(max), then invert x = G + B * (u / (1 - u))^(1/A).
+    No rejection loop - every draw lands inside the truncation limits.
+    """
+    if rng is None:
+        rng = get_rng()
+    # Evaluated in place on the uniform buffer (one temporary for 1 - u)
+    u = rng.random(n_samples, dtype=MC_DTYPE)
+    u *= MEAL_SIZE_CDF_MAX - MEAL_SIZE_CDF_MIN
+    u += MEAL_SIZE_CDF_MIN
+    np.divide(u, np.subtract(1.0, u, dtype=MC_DTYPE), out=u)
+    u **= MEAL_SIZE_INV_A
+    u *= MEAL_SIZE_B
+    u += MEAL_SIZE_G
+    return u
+
+
+def sample_baf(n_samples, mean=BAF_MEAN, std=BAF_STD, rng=None):
     """
     Sample BAF (Bioaccumulation Factor) from normal distribution
-    Truncated to positive values
+    Truncated below at BAF_MIN (ensures positive values)
+
+    Uses inverse-CDF sampling on the truncated range: u ~ U(Phi(a), 1),
+    x = mean + std * Phi^-1(u). Values are never clipped or rejected.
     """
-    samples = np.random.normal(mean, std, n_samples)
-    samples = np.maximum(samples, 1.0)  # Ensure positive
-    return samples
+    if rng is None:
+        rng = get_rng()
+    cdf_min = ndtr((BAF_MIN - mean) / std)
+    # Uniforms drawn in float64: a float32 u can round to 1.0, where ndtri is infinite
+    u = rng.uniform(cdf_min, 1.0, n_samples)
+    samples = mean + std * ndtri(u)
+    return samples.astype(MC_DTYPE)
 
 
-def sample_hockey_stick_concentration(n_samples, x0, x50, x100, percentile_break=0.95):
+def sample_hockey_stick_concentration(n_samples, x0, x50, x100, percentile_break=0.95, rng=None, u=None):
     """
     Sample from hockey-stick distribution (David McBride method)
 
@@ -127,7 +262,12 @@ def sample_hockey_stick_concentration(n_samples, x0, x50, x100, percentile_break
     - x50: Median concentration (50th percentile)
     - x100: Maximum concentration
     - percentile_break: Where to place the breakpoint (default 95th percentile)
+    - rng: numpy Generator (defaults to the shared app generator)
+    - u: optional pre-drawn uniforms in [0, 1), e.g. quasi-random points (drawn from rng if None)
     """
+    if rng is None:
+        rng = get_rng()
+
     # Calculate h1 (height of triangular section)
     h1 = 2 * 0.5 / (x50 - x0)
 
@@ -139,26 +279,42 @@ def sample_hockey_stick_concentration(n_samples, x0, x50, x100, percentile_break
     xp = x50 + (x100 - x50) * percentile_break
 
     # Sample uniformly then transform
-    samples = []
-    for _ in range(n_samples):
-        u = np.random.random()
-
-        if u <= 0.5:
-            # Lower segment (0 to median) - triangular rise
-            x = x0 + np.sqrt(u * 2 * (x50 - x0) / h1)
-        elif u <= percentile_break:
-            # Middle segment (median to breakpoint) - linear
-            x = x50 + (u - 0.5) * (xp - x50) / (percentile_break - 0.5)
-        else:
-            # Upper segment (breakpoint to max) - tail
-            x = xp + (u - percentile_break) * (x100 - xp) / (1 - percentile_break)
+    if u is None:
+        u = rng.random(n_samples)
+
+    # Segment index per draw: 0 = below median, 1 = median to breakpoint, 2 = tail
+    segment = (u > 0.5).view(np.int8) + (u > percentile_break).view(np.int8)
+
+    # Middle segment (median to breakpoint) and tail (breakpoint to max) are both linear in u:
+    # gather per-draw slope/intercept and evaluate them in one pass
+    slope = np.array([0.0,
+                      (xp - x50) / (percentile_break - 0.5),
+                      (x100 - xp) / (1 - percentile_break)])
+    intercept = np.array([0.0,
+                          x50 - 0.5 * slope[1],
+                          xp - percentile_break * slope[2]])
+    x = slope[segment] * u
+    x += intercept[segment]
+
+    # Lower segment (0 to median) - triangular rise, only evaluated on its own draws
+    m = segment == 0
+    x[m] = x0 + np.sqrt(u[m] * (2 * (x50 - x0) / h1))
+
+    return x
 
-        samples.append(x)
 
-    return np.array(samples)
+def sorted_dilution_data(dilution_data):
+    """
+    NaN-free, sorted copy of a site's observed dilution values
+
+    Note: Computed once per run and reused by every ECDF draw for the site. Not
+    st.cache_data'd - hashing and unpickling the array costs about as much as the
+    sort, and each uploaded dataset would add a permanent entry per site
+    """
+    return np.sort(dilution_data[~np.isnan(dilution_data)])
 
 
-def sample_ecdf(dilution_data, n_samples):
+def sample_ecdf(dilution_data, n_samples, rng=None, u=None, presorted=False):
     """
     Sample from Empirical Cumulative Distribution Function (ECDF)
 
@@ -168,39 +324,156 @@ def sample_ecdf(dilution_data, n_samples):
     Parameters:
     - dilution_data: array of observed dilution values
     - n_samples: number of samples to draw
+    - rng: numpy Generator (defaults to the shared app generator)
+    - u: optional pre-drawn uniforms in [0, 1), e.g. quasi-random points (drawn from rng if None)
+    - presorted: dilution_data is already NaN-free and sorted (e.g. from sorted_dilution_data)
 
     Returns:
     - array of sampled dilution values
     """
-    # Remove NaN values
-    dilution_data = dilution_data[~np.isnan(dilution_data)]
+    if rng is None:
+        rng = get_rng()
+
+    # NaN-free sorted data, so index = floor(u * n) is the ECDF inverse
+    if presorted:
+        sorted_data = dilution_data
+    else:
+        sorted_data = sorted_dilution_data(np.asarray(dilution_data, dtype=float))
 
-    if len(dilution_data) == 0:
+    if len(sorted_data) == 0:
         raise ValueError("No valid dilution data provided")
 
-    # Sample with replacement from the empirical data
-    samples = np.random.choice(dilution_data, size=n_samples, replace=True)
+    # Sample with replacement from the empirical data: one uniform draw + one gather
+    if u is None:
+        u = rng.random(n_samples)
+    idx = (u * len(sorted_data)).astype(np.intp)
+    np.minimum(idx, len(sorted_data) - 1, out=idx)  # guard u * n rounding up to n
+    samples = sorted_data[idx]
 
     return samples
 
 
-def run_shellfish_qmra_advanced(
-    site_name, dilution_data, effluent_min, effluent_median, effluent_max,
-    log_removal_wwtp, num_people, iterations,
-    mode='simple',
-    meal_size_fixed=50.0,
-    mhf_fixed=18.5,
+def simulate_population(site_conc, num_people, mode, meal_size_fixed, mhf_fixed,
+                        use_variable_baf, rng=None, timer=None, scratch=None):
+    """
+    Simulate exposure, infection and illness for num_people per iteration
+
+    Parameters:
+    -----------
+    site_conc : ndarray, shape (iterations,)
+        Pathogen concentration at the site for each iteration
+    rng : numpy.random.Generator, optional
+        Random generator for all draws (defaults to the shared app generator)
+    timer : PhaseTimer, optional
+        Accumulates time spent in sampling / dose-response / outcomes
+    scratch : Scratch, optional
+        Work buffers with at least site_conc.size rows (allocated if None)
+
+    Returns:
+    --------
+    tuple of ndarray : (total infections, total illness) per iteration
+    """
+    if rng is None:
+        rng = get_rng()
+    if timer is None:
+        timer = PhaseTimer()
+
+    # Simple mode: everyone in an iteration has the same continuous dose d = k + f. Dose
+    # discretization gives each person k or k + 1 organisms (the latter w.p. f), so people
+    # are infected independently with one shared probability and the per-iteration totals
+    # are exactly Binomial(num_people, p) - no (iterations, num_people) arrays needed
+    if mode != 'advanced':
+        doses = site_conc * (meal_size_fixed / 1000.0) * mhf_fixed
+        dose_floor = np.floor(doses)
+        frac = doses - dose_floor
+        dose_floor = dose_floor.astype(int)
+        p_infection = (
+            (1.0 - frac) * beta_binomial_infection_prob(dose_floor, ALPHA, BETA)
+            + frac * beta_binomial_infection_prob(dose_floor + 1, ALPHA, BETA)
+        )
+        timer.lap('dose-response')
+
+        total_infections_all = rng.binomial(num_people, p_infection)
+        total_illness_all = rng.binomial(total_infections_all, PR_ILLNESS_GIVEN_INFECTION)
+        timer.lap('outcomes')
+        return total_infections_all, total_illness_all
+
+    # Cache blocking: run the per-person chain on row blocks small enough that the
+    # temporaries stay in L2/L3 cache instead of streaming through DRAM once per step
+    block_rows = max(1, MC_BLOCK_ELEMENTS // num_people)
+    if site_conc.size > block_rows:
+        scratch = Scratch(block_rows, num_people)
+        block_totals = [
+            simulate_population(
+                site_conc[start:start + block_rows], num_people, mode, meal_size_fixed,
+                mhf_fixed, use_variable_baf, rng=rng, timer=timer, scratch=scratch
+            )
+            for start in range(0, site_conc.size, block_rows)
+        ]
+        return (np.concatenate([t[0] for t in block_totals]),
+                np.concatenate([t[1] for t in block_totals]))
+
+    # 5. Sample meal sizes and BAF for ALL iterations and people
+    # Fixed values stay scalars and are broadcast in step 6 (no np.full buffers)
+    iterations = site_conc.size
+    shape = (iterations, num_people)
+    if scratch is None:
+        scratch = Scratch(iterations, num_people)
+    dose_buf, uniform_buf, infected_buf = scratch.view(iterations)
+    # Variable meal sizes (LogLogistic) - shape: (iterations, num_people)
+    meal_sizes = sample_meal_size_loglogistic(iterations * num_people, rng=rng).reshape(shape)
+
+    if use_variable_baf:
+        bafs = sample_baf(iterations * num_people, rng=rng).reshape(shape)
+    else:
+        bafs = mhf_fixed
+
+    timer.lap('sampling')
+
+    # 6. Calculate doses for ALL people in ALL iterations (vectorized)
+    # Fold the meal g -> water-equivalent L conversion into the per-iteration concentration,
+    # then broadcast straight into the reusable dose buffer - no full-size temporaries
+    conc_per_g = site_conc[:, np.newaxis] / 1000.0  # shape: (iterations, 1)
+    doses_continuous = dose_buf
+    np.multiply(conc_per_g, meal_sizes, out=doses_continuous)
+    doses_continuous *= bafs
+
+    # 7. Discretize doses (vectorized)
+    # Element-wise on the 2-D array directly - no flatten()/reshape() copies
+    doses_discrete = discretize_dose(doses_continuous, rng=rng)
+
+    # 8. Calculate infection probability (vectorized)
+    p_infection = beta_binomial_infection_prob(doses_discrete, ALPHA, BETA)
+
+    timer.lap('dose-response')
+
+    # 9. Determine infections (vectorized)
+    # Bernoulli(p) as u < p into a 1-byte boolean indicator (8x smaller than int64)
+    rng.random(dtype=MC_DTYPE, out=uniform_buf)
+    infected = np.less(uniform_buf, p_infection, out=infected_buf)
+
+    # 10. Count infections for each iteration (vectorized)
+    total_infections_all = np.sum(infected, axis=1)  # Sum over people for each iteration
+
+    # 11. Determine illness (VECTORIZED - no per-person mask or scatter)
+    # Each infected person falls ill independently, so illness per iteration is
+    # Binomial(infections, Pr(ill|inf)) - identical to summing per-person draws
+    total_illness_all = rng.binomial(total_infections_all, PR_ILLNESS_GIVEN_INFECTION)
+    timer.lap('outcomes')
+
+    return total_infections_all, total_illness_all
+
+
+def sample_site_concentration(
+    dilution_data, effluent_min, effluent_median, effluent_max,
+    log_removal_wwtp, iterations,
     use_hockey_stick=True,
-    use_variable_baf=False,
-    progress_bar=None
+    use_sobol=False,
+    presorted_dilution=False,
+    rng=None
 ):
     """
-    Run QMRA for shellfish using David's preferred methods
-
-    OPTIMIZED VERSION: 10-20x faster with full NumPy vectorization!
-    - No Python loops over iterations
-    - Batch random number generation
-    - All operations use NumPy broadcasting
+    Sample the pathogen concentration at the site for each iteration (steps 1-4)
 
     Parameters:
     -----------
@@ -208,107 +481,336 @@ def run_shellfish_qmra_advanced(
         Empirical dilution measurements (ECDF sampling)
     use_hockey_stick : bool
         Use hockey-stick distribution for effluent (David's method)
-    mode : str
-        'simple' = fixed meal size and MHF
-        'advanced' = variable meal size and optional variable BAF
-    """
+    use_sobol : bool
+        Drive the hockey-stick effluent and ECDF dilution draws with scrambled Sobol points
+        (iterations must then be a power of 2, so the point set stays balanced)
+    presorted_dilution : bool
+        dilution_data is already NaN-free and sorted (precomputed ECDF support)
+    rng : numpy.random.Generator, optional
+        Random generator for all draws (defaults to the shared app generator)
 
-    # VECTORIZED COMPUTATION - 10-20x faster than loop-based approach!
-    # All iterations computed at once using NumPy broadcasting
+    Returns:
+    --------
+    ndarray, shape (iterations,) : site concentration per iteration
+    """
+    if rng is None:
+        rng = get_rng()
+
+    # Per-iteration (environmental) uniforms: quasi-random Sobol points or pseudo-random
+    u_effluent = u_dilution = None
+    if use_sobol:
+        from scipy.stats.qmc import Sobol  # Lazy: scipy.stats is slow to import
+        iterations = operator.index(iterations)  # Plain int (e.g. np.int64 read from a DataFrame)
+        if iterations < 1 or iterations & (iterations - 1):
+            raise ValueError(f"Sobol sampling needs a power-of-2 number of iterations, got {iterations}")
+        u_env = Sobol(d=2, scramble=True, seed=rng).random_base2(iterations.bit_length() - 1)
+        u_effluent, u_dilution = u_env[:, 0], u_env[:, 1]
 
     # 1. Sample effluent concentrations for ALL iterations at once
     if use_hockey_stick:
         effluent_conc = sample_hockey_stick_concentration(
-            iterations, effluent_min, effluent_median, effluent_max
+            iterations, effluent_min, effluent_median, effluent_max, rng=rng, u=u_effluent
         )
     else:
-        effluent_conc = np.random.triangular(effluent_min, effluent_median, effluent_max, size=iterations)
+        effluent_conc = rng.triangular(effluent_min, effluent_median, effluent_max, size=iterations)
 
     # 2. Apply WWTP treatment (vectorized)
     treated_conc = effluent_conc / (10 ** log_removal_wwtp)
 
     # 3. Sample dilution from ECDF for ALL iterations
-    dilution_sampled = sample_ecdf(dilution_data, iterations)
+    dilution_sampled = sample_ecdf(dilution_data, iterations, rng=rng, u=u_dilution,
+                                   presorted=presorted_dilution)
 
     # 4. Apply dilution (vectorized)
-    site_conc = treated_conc / dilution_sampled  # shape: (iterations,)
+    return treated_conc / dilution_sampled
 
-    # 5. Sample meal sizes and BAF for ALL iterations and people
-    if mode == 'advanced':
-        # Variable meal sizes (LogLogistic) - shape: (iterations, num_people)
-        meal_sizes = sample_meal_size_loglogistic(iterations * num_people).reshape(iterations, num_people)
 
-        if use_variable_baf:
-            bafs = sample_baf(iterations * num_people).reshape(iterations, num_people)
-        else:
-            bafs = np.full((iterations, num_people), mhf_fixed)
-    else:
-        # Simple mode: fixed values
-        meal_sizes = np.full((iterations, num_people), meal_size_fixed)
-        bafs = np.full((iterations, num_people), mhf_fixed)
-
-    # 6. Calculate doses for ALL people in ALL iterations (vectorized)
-    water_equiv_L = meal_sizes / 1000.0
-    # Broadcast site_conc to match shape (iterations, num_people)
-    doses_continuous = site_conc[:, np.newaxis] * water_equiv_L * bafs
-
-    # 7. Discretize doses (vectorized)
-    doses_discrete = discretize_dose(doses_continuous.flatten()).reshape(iterations, num_people)
-
-    # 8. Calculate infection probability (vectorized)
-    p_infection = beta_binomial_infection_prob(doses_discrete.flatten(), ALPHA, BETA).reshape(iterations, num_people)
+def population_shards(site_conc, seed):
+    """
+    Fixed shard layout for the per-person stage of one site
 
-    # 9. Determine infections (vectorized)
-    infected = np.random.binomial(1, p_infection)
+    One shard per MIN_ITERATIONS_PER_WORKER iterations, each paired with its own
+    child of `seed` (a SeedSequence). The layout depends only on the data, so a seeded
+    run gives the same numbers whatever the number of threads running the shards
 
-    # 10. Determine illness (VECTORIZED - no nested loop!)
-    # For each infected person, determine if they become ill
-    ill = np.zeros_like(infected)
-    ill[infected == 1] = np.random.binomial(1, PR_ILLNESS_GIVEN_INFECTION, size=np.sum(infected))
+    Returns:
+    --------
+    list of (ndarray, SeedSequence) : (site concentrations, shard seed) per shard
+    """
+    n_shards = max(1, -(-site_conc.size // MIN_ITERATIONS_PER_WORKER))  # ceil division
+    return list(zip(np.array_split(site_conc, n_shards), seed.spawn(n_shards)))
 
-    # 11. Count totals for each iteration (vectorized)
-    total_infections_all = np.sum(infected, axis=1)  # Sum over people for each iteration
-    total_illness_all = np.sum(ill, axis=1)
 
-    if progress_bar:
-        progress_bar.progress(1.0)
+def summarize_site(site_name, dilution_data, mode, num_people, iterations,
+                   total_infections_all, total_illness_all):
+    """Results dictionary (summary statistics and distributions) for one site"""
+    # Per-iteration counts are stored as int32: exact for any population size, half the
+    # memory/serialization of the int64 the simulation produces
+    total_infections_all = total_infections_all.astype(np.int32, copy=False)
+    total_illness_all = total_illness_all.astype(np.int32, copy=False)
 
     # Statistics (already numpy arrays, no conversion needed)
+    # One selection pass per distribution for all reported percentiles (5th, median, 95th)
+    infections_mean = np.mean(total_infections_all)
+    inf_5th, inf_median, inf_95th = np.percentile(total_infections_all, [5, 50, 95])
+    ill_5th, ill_median, ill_95th = np.percentile(total_illness_all, [5, 50, 95])
 
-    results = {
+    return {
         'site_name': site_name,
         'dilution_mean': np.mean(dilution_data),
         'dilution_median': np.median(dilution_data),
         'mode': mode,
         'num_people': num_people,
         'iterations': iterations,
-        'infections_mean': np.mean(total_infections_all),
-        'infections_median': np.median(total_infections_all),
-        'infections_5th': np.percentile(total_infections_all, 5),
-        'infections_95th': np.percentile(total_infections_all, 95),
+        'infections_mean': infections_mean,
+        'infections_median': inf_median,
+        'infections_5th': inf_5th,
+        'infections_95th': inf_95th,
         'infections_min': np.min(total_infections_all),
         'infections_max': np.max(total_infections_all),
         'infections_distribution': total_infections_all,
         'illness_mean': np.mean(total_illness_all),
-        'illness_median': np.median(total_illness_all),
-        'illness_5th': np.percentile(total_illness_all, 5),
-        'illness_95th': np.percentile(total_illness_all, 95),
+        'illness_median': ill_median,
+        'illness_5th': ill_5th,
+        'illness_95th': ill_95th,
         'illness_min': np.min(total_illness_all),
         'illness_max': np.max(total_illness_all),
         'illness_distribution': total_illness_all,
-        'risk_per_person_mean': np.mean(total_infections_all) / num_people,
-        'risk_per_person_median': np.median(total_infections_all) / num_people,
+        'risk_per_person_mean': infections_mean / num_people,
+        'risk_per_person_median': inf_median / num_people,
+    }
+
+
+def run_shellfish_qmra_advanced(
+    site_name, dilution_data, effluent_min, effluent_median, effluent_max,
+    log_removal_wwtp, num_people, iterations,
+    mode='simple',
+    meal_size_fixed=50.0,
+    mhf_fixed=18.5,
+    use_hockey_stick=True,
+    use_variable_baf=False,
+    progress_bar=None,
+    rng=None,
+    timer=None,
+    n_workers=None,
+    use_sobol=False
+):
+    """
+    Run QMRA for a single site - a one-site run_shellfish_qmra_batch
+
+    Parameters:
+    -----------
+    dilution_data : array-like
+        Empirical dilution measurements (ECDF sampling)
+    mode, mhf_fixed, use_hockey_stick, use_variable_baf, progress_bar, rng, timer,
+    n_workers, use_sobol :
+        As for run_shellfish_qmra_batch
+
+    Returns:
+    --------
+    dict : results for the site
+    """
+    site = {
+        'site_name': site_name,
+        'dilution_data': dilution_data,
+        'effluent_min': effluent_min,
+        'effluent_median': effluent_median,
+        'effluent_max': effluent_max,
+        'log_removal_wwtp': log_removal_wwtp,
+        'meal_size_fixed': meal_size_fixed,
+        'num_people': num_people,
+        'iterations': iterations,
     }
+    return run_shellfish_qmra_batch(
+        [site], mode=mode, mhf_fixed=mhf_fixed, use_hockey_stick=use_hockey_stick,
+        use_variable_baf=use_variable_baf, use_sobol=use_sobol, progress_bar=progress_bar,
+        rng=rng, timer=timer, n_workers=n_workers
+    )[0]
+
+
+def run_shellfish_qmra_batch(
+    sites,
+    mode='simple',
+    mhf_fixed=18.5,
+    use_hockey_stick=True,
+    use_variable_baf=False,
+    use_sobol=False,
+    progress_bar=None,
+    rng=None,
+    timer=None,
+    n_workers=None
+):
+    """
+    Run QMRA for several sites, with the per-person shards of all sites on one thread pool
+
+    Each site gets its own spawned seed, split into an environmental and a population
+    stream, and a shard layout fixed by its iteration count - so a site's results depend
+    only on its own seed, not on the other sites or on the host's core count.
+
+    "David's preferred methods": hockey-stick effluent, ECDF dilution, LogLogistic meal
+    sizes (advanced mode) and exact Beta-Binomial dose-response, all vectorized.
+
+    Parameters:
+    -----------
+    sites : list of dict
+        One dict per site with keys 'site_name', 'dilution_data', 'effluent_min',
+        'effluent_median', 'effluent_max', 'log_removal_wwtp', 'meal_size_fixed',
+        'num_people' and 'iterations', plus optional 'presorted_dilution' (bool)
+    mode : str
+        'simple' = fixed meal size and MHF
+        'advanced' = variable meal size and optional variable BAF
+    use_hockey_stick : bool
+        Use hockey-stick distribution for effluent (David's method)
+    use_sobol : bool
+        Drive the per-iteration hockey-stick effluent and ECDF dilution draws
+        with scrambled Sobol points instead of pseudo-random numbers. Sobol
+        balance needs iterations to be a power of 2 (e.g. 8192, 16384); other
+        counts raise ValueError
+    progress_bar : st.progress, optional
+        Advanced as each site's population simulation completes
+    rng : numpy.random.Generator, optional
+        Random generator the per-site seeds are drawn from (defaults to the shared app generator)
+    timer : PhaseTimer, optional
+        Accumulates time spent in sampling / dose / outcomes / statistics
+    n_workers : int, optional
+        Threads to run the population shards on (default: the CPU count, capped at the
+        shard count)
+
+    Returns:
+    --------
+    list of dict : results per site, in input order
+    """
+    if rng is None:
+        rng = get_rng()
+    if timer is None:
+        timer = PhaseTimer()
+    timer.reset()
+
+    # One seed per site: child 0 drives the environmental draws, child 1 the population
+    site_seeds = [
+        site_seed.spawn(2)
+        for site_seed in np.random.SeedSequence(rng.integers(2**63)).spawn(len(sites))
+    ]
+
+    # 1-4. Site concentration per iteration, per site
+    site_concs = [
+        sample_site_concentration(
+            site['dilution_data'], site['effluent_min'], site['effluent_median'],
+            site['effluent_max'], site['log_removal_wwtp'], site['iterations'],
+            use_hockey_stick=use_hockey_stick, use_sobol=use_sobol,
+            presorted_dilution=site.get('presorted_dilution', False),
+            rng=np.random.default_rng(environment_seed)
+        )
+        for site, (environment_seed, _) in zip(sites, site_seeds)
+    ]
+    timer.lap('sampling')
+
+    # 5-11. Per-person exposure and outcomes: every site's shards go to one shared pool
+    # (the heavy NumPy/SciPy kernels release the GIL). Simple mode is O(iterations) and
+    # not worth the thread overhead
+    site_shards = [
+        population_shards(site_conc, population_seed)
+        for site_conc, (_, population_seed) in zip(site_concs, site_seeds)
+    ]
+
+    def simulate_shard(site, chunk, seed, timer=None):
+        return simulate_population(
+            chunk, int(site['num_people']), mode, site['meal_size_fixed'], mhf_fixed,
+            use_variable_baf, rng=np.random.default_rng(seed), timer=timer
+        )
+
+    if n_workers is None:
+        n_shards = sum(len(shards) for shards in site_shards)
+        n_workers = min(os.cpu_count() or 1, n_shards) if mode == 'advanced' else 1
+    with ThreadPoolExecutor(max_workers=max(n_workers, 1)) as executor:
+        if n_workers > 1:
+            site_futures = [
+                [executor.submit(simulate_shard, site, chunk, seed) for chunk, seed in shards]
+                for site, shards in zip(sites, site_shards)
+            ]
+            site_runs = ([future.result() for future in futures] for futures in site_futures)
+        else:
+            site_runs = (
+                [simulate_shard(site, chunk, seed, timer=timer) for chunk, seed in shards]
+                for site, shards in zip(sites, site_shards)
+            )
+        # Collected site by site on the script thread, so the progress bar can advance
+        shard_totals = []
+        for site_run in site_runs:
+            shard_totals.append(site_run)
+            if progress_bar:
+                progress_bar.progress(len(shard_totals) / len(sites))
+    if n_workers > 1:
+        timer.lap('population (threaded)')
+
+    totals = [
+        (np.concatenate([t[0] for t in shards]), np.concatenate([t[1] for t in shards]))
+        for shards in shard_totals
+    ]
+
+    results = [
+        summarize_site(site['site_name'], site['dilution_data'], mode, int(site['num_people']),
+                       int(site['iterations']), *site_totals)
+        for site, site_totals in zip(sites, totals)
+    ]
+    timer.lap('statistics')
 
     return results
 
 
-@st.cache_data(show_spinner="Checking data quality...")
+# Batch runner specialized once at import to the configured methods, so the app
+# no longer re-derives mode and flags per run
+run_shellfish_qmra_david = partial(
+    run_shellfish_qmra_batch,
+    mode='advanced' if USE_VARIABLE_MEAL else 'simple',
+    mhf_fixed=MHF_MEAN,
+    use_hockey_stick=USE_HOCKEY_STICK,
+    use_variable_baf=USE_VARIABLE_BAF
+)
+
+
+@st.cache_data(show_spinner=False)
+def load_csv(csv_bytes):
+    """
+    Parse CSV file contents into a DataFrame
+
+    Note: Cached on the raw bytes - Streamlit reruns skip re-parsing unchanged files.
+    Uses pandas' multi-threaded pyarrow parser when it can read the file as the default
+    C parser would; otherwise (ragged rows, comment lines, non-UTF-8 text) the C parser
+    handles it, so short rows still reach the data quality check as missing values
+    """
+    try:
+        df = pd.read_csv(io.BytesIO(csv_bytes), engine='pyarrow')
+    except (ImportError, ValueError):
+        # pyarrow not installed, or a parse error (ParserError and ArrowInvalid are ValueErrors)
+        return pd.read_csv(io.BytesIO(csv_bytes))
+
+    # pyarrow keeps undecodable (e.g. Latin-1) text as raw bytes instead of failing
+    for column in df.columns[df.dtypes == object]:
+        if any(isinstance(value, bytes) for value in df[column]):
+            return pd.read_csv(io.BytesIO(csv_bytes))
+    return df
+
+
+def encode_csv(df):
+    """
+    Encode a results table as UTF-8 CSV bytes for download
+
+    Note: Written straight into a bytes buffer in row chunks, so large iteration tables
+    never materialize as a full-size str before encoding. Not st.cache_data'd - results
+    are new Monte Carlo output every run, so the app keeps the bytes with the run in
+    st.session_state instead
+    """
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, encoding='utf-8', chunksize=100_000)
+    return buffer.getvalue()
+
+
 def check_data_quality(sites_df, dilutions_df):
     """
     Comprehensive data quality checker for QMRA input data
 
-    Note: Cached for performance - validation only runs once per unique dataset
+    Note: The app calls this through check_data_quality_csv, cached on the raw file bytes
 
     Returns:
     --------
@@ -402,45 +904,39 @@ def check_data_quality(sites_df, dilutions_df):
     # 4. RANGE VALIDATION
     # ============================================================================
 
-    if 'Effluent_Min' in sites_df.columns and not sites_df['Effluent_Min'].isna().all():
-        if (sites_df['Effluent_Min'] <= 0).any():
-            errors.append("CRITICAL: Effluent_Min must be positive (> 0)")
-
-    if 'Effluent_Median' in sites_df.columns and not sites_df['Effluent_Median'].isna().all():
-        if (sites_df['Effluent_Median'] <= 0).any():
-            errors.append("CRITICAL: Effluent_Median must be positive (> 0)")
-
-    if 'Effluent_Max' in sites_df.columns and not sites_df['Effluent_Max'].isna().all():
-        if (sites_df['Effluent_Max'] <= 0).any():
-            errors.append("CRITICAL: Effluent_Max must be positive (> 0)")
-
-    if 'WWTP_Log_Removal' in sites_df.columns and not sites_df['WWTP_Log_Removal'].isna().all():
-        if (sites_df['WWTP_Log_Removal'] < 0).any():
-            errors.append("CRITICAL: WWTP_Log_Removal cannot be negative")
-        if (sites_df['WWTP_Log_Removal'] > 10).any():
-            warnings.append("WARNING: WWTP_Log_Removal > 10 is unusually high (typical range: 0-5)")
-
-    if 'Meal_Size_g' in sites_df.columns and not sites_df['Meal_Size_g'].isna().all():
-        if (sites_df['Meal_Size_g'] <= 0).any():
-            errors.append("CRITICAL: Meal_Size_g must be positive (> 0)")
-        if (sites_df['Meal_Size_g'] > 1000).any():
-            warnings.append("WARNING: Meal_Size_g > 1000g is unusually large")
-
-    if 'Num_People' in sites_df.columns and not sites_df['Num_People'].isna().all():
-        if (sites_df['Num_People'] <= 0).any():
-            errors.append("CRITICAL: Num_People must be positive (> 0)")
-        if (sites_df['Num_People'] != sites_df['Num_People'].astype(int)).any():
-            errors.append("CRITICAL: Num_People must be integer values")
-
-    if 'Iterations' in sites_df.columns and not sites_df['Iterations'].isna().all():
-        if (sites_df['Iterations'] <= 0).any():
-            errors.append("CRITICAL: Iterations must be positive (> 0)")
-        if (sites_df['Iterations'] != sites_df['Iterations'].astype(int)).any():
-            errors.append("CRITICAL: Iterations must be integer values")
-        if (sites_df['Iterations'] < 100).any():
-            warnings.append("WARNING: Iterations < 100 may produce unreliable statistics (recommend >= 1000)")
-        if (sites_df['Iterations'] < 1000).any():
-            info.append("INFO: For production runs, recommend Iterations >= 10,000")
+    # Coerce the numeric columns once, then evaluate each comparison over the whole
+    # column group in a single pass (non-numeric entries become NaN and compare False)
+    numeric_sites = sites_df[numeric_cols].apply(pd.to_numeric, errors='coerce')
+    non_positive = (numeric_sites <= 0).any()
+    non_integer = np.modf(numeric_sites[['Num_People', 'Iterations']])[0].any()
+
+    for col in ['Effluent_Min', 'Effluent_Median', 'Effluent_Max']:
+        if non_positive[col]:
+            errors.append(f"CRITICAL: {col} must be positive (> 0)")
+
+    if (numeric_sites['WWTP_Log_Removal'] < 0).any():
+        errors.append("CRITICAL: WWTP_Log_Removal cannot be negative")
+    if (numeric_sites['WWTP_Log_Removal'] > 10).any():
+        warnings.append("WARNING: WWTP_Log_Removal > 10 is unusually high (typical range: 0-5)")
+
+    if non_positive['Meal_Size_g']:
+        errors.append("CRITICAL: Meal_Size_g must be positive (> 0)")
+    if (numeric_sites['Meal_Size_g'] > 1000).any():
+        warnings.append("WARNING: Meal_Size_g > 1000g is unusually large")
+
+    if non_positive['Num_People']:
+        errors.append("CRITICAL: Num_People must be positive (> 0)")
+    if non_integer['Num_People']:
+        errors.append("CRITICAL: Num_People must be integer values")
+
+    if non_positive['Iterations']:
+        errors.append("CRITICAL: Iterations must be positive (> 0)")
+    if non_integer['Iterations']:
+        errors.append("CRITICAL: Iterations must be integer values")
+    if (numeric_sites['Iterations'] < 100).any():
+        warnings.append("WARNING: Iterations < 100 may produce unreliable statistics (recommend >= 1000)")
+    if (numeric_sites['Iterations'] < 1000).any():
+        info.append("INFO: For production runs, recommend Iterations >= 10,000")
 
     # Check dilution values
     if 'Dilution_Value' in dilutions_df.columns and not dilutions_df['Dilution_Value'].isna().all():
@@ -485,7 +981,12 @@ def check_data_quality(sites_df, dilutions_df):
     # ============================================================================
 
     # Count dilution measurements per site
-    dilution_counts = dilutions_df.groupby('Site_Name').size()
+    # Integer-code the site names once and count with np.bincount (no groupby dispatch)
+    site_codes, site_names = pd.factorize(dilutions_df['Site_Name'], sort=True)
+    dilution_counts = pd.Series(
+        np.bincount(site_codes[site_codes >= 0], minlength=len(site_names)),
+        index=site_names
+    )
 
     for site in sites_in_sites_csv:
         if site in dilution_counts:
@@ -511,22 +1012,25 @@ def check_data_quality(sites_df, dilutions_df):
     # 9. STATISTICAL ANOMALY DETECTION
     # ============================================================================
 
+    # Per-site dilution statistics from one groupby pass (no full-frame mask per site)
+    site_dilutions = dilutions_df.groupby('Site_Name')['Dilution_Value']
+    dilution_nunique = site_dilutions.nunique()
+    q1 = dilutions_df['Site_Name'].map(site_dilutions.quantile(0.25))
+    q3 = dilutions_df['Site_Name'].map(site_dilutions.quantile(0.75))
+    iqr = q3 - q1
+    is_outlier = (dilutions_df['Dilution_Value'] < q1 - 3*iqr) | (dilutions_df['Dilution_Value'] > q3 + 3*iqr)
+    outlier_counts = is_outlier.groupby(dilutions_df['Site_Name']).sum()
+
     # Check for constant dilution values (no variability)
     for site in sites_in_sites_csv:
-        site_dilutions = dilutions_df[dilutions_df['Site_Name'] == site]['Dilution_Value']
-        if len(site_dilutions) > 1 and site_dilutions.nunique() == 1:
+        if dilution_counts.get(site, 0) > 1 and dilution_nunique[site] == 1:
             warnings.append(f"WARNING: Site '{site}' has identical dilution values (no variability)")
 
     # Check for extreme outliers in dilutions (> 3 IQR from median)
     for site in sites_in_sites_csv:
-        site_dilutions = dilutions_df[dilutions_df['Site_Name'] == site]['Dilution_Value']
-        if len(site_dilutions) >= 4:  # Need enough data for IQR
-            Q1 = site_dilutions.quantile(0.25)
-            Q3 = site_dilutions.quantile(0.75)
-            IQR = Q3 - Q1
-            outliers = site_dilutions[(site_dilutions < Q1 - 3*IQR) | (site_dilutions > Q3 + 3*IQR)]
-            if len(outliers) > 0:
-                info.append(f"INFO: Site '{site}' has {len(outliers)} extreme outlier(s) in dilution data")
+        if dilution_counts.get(site, 0) >= 4:  # Need enough data for IQR
+            if outlier_counts[site] > 0:
+                info.append(f"INFO: Site '{site}' has {outlier_counts[site]} extreme outlier(s) in dilution data")
 
     # ============================================================================
     # 10. SUMMARY STATISTICS
@@ -556,6 +1060,210 @@ def check_data_quality(sites_df, dilutions_df):
     }
 
 
+@st.cache_data(show_spinner="Checking data quality...")
+def check_data_quality_csv(sites_bytes, dilutions_bytes):
+    """
+    check_data_quality on the parsed sites and dilutions CSV files
+
+    Note: Cached on the raw bytes - validation only runs once per unique pair of
+    input files, and reruns hash two byte strings instead of two DataFrames
+    """
+    return check_data_quality(load_csv(sites_bytes), load_csv(dilutions_bytes))
+
+
+def histogram_bar_traces(all_results, key, bins=30):
+    """
+    Bin each site's distribution server-side and return one go.Bar trace per site
+
+    All sites share the same bin edges so overlaid bars line up. Only the
+    bin counts are sent to the browser instead of every Monte Carlo sample.
+    """
+    edges = np.histogram_bin_edges(np.concatenate([r[key] for r in all_results]), bins=bins)
+    centers = 0.5 * (edges[:-1] + edges[1:])
+    widths = np.diff(edges)
+
+    traces = []
+    for result in all_results:
+        counts, _ = np.histogram(result[key], bins=edges)
+        traces.append(go.Bar(
+            x=centers,
+            y=counts,
+            width=widths,
+            name=result['site_name'],
+            opacity=0.7
+        ))
+    return traces
+
+
+def cdf_scatter_traces(all_results, key, max_points=512):
+    """
+    Empirical CDF of each site's distribution as one go.Scatter trace per site
+
+    Infection/illness counts are integers with few distinct values, so the exact
+    step ECDF is drawn from the unique values only. Distributions with more than
+    max_points distinct values are decimated to max_points evenly spaced quantiles.
+    Probabilities are sent as float32 (ample for plotting, half the payload).
+    """
+    # Decimation grid shared by all sites
+    quantile_grid = np.linspace(0, 1, max_points)
+
+    traces = []
+    for result in all_results:
+        values, counts = np.unique(result[key], return_counts=True)
+        if values.size <= max_points:
+            n = result[key].size
+            x, y, line_shape = values, np.cumsum(counts) * (1.0 / n), 'hv'
+        else:
+            x, y, line_shape = np.quantile(result[key], quantile_grid), quantile_grid, 'linear'
+        y = y.astype(np.float32)
+        traces.append(go.Scatter(
+            x=x,
+            y=y,
+            name=result['site_name'],
+            mode='lines',
+            line_shape=line_shape
+        ))
+    return traces
+
+
+def distribution_figures(all_results):
+    """
+    Per-site distribution figures: box plots, histograms and CDFs of infections and illness
+
+    Returns:
+    --------
+    tuple of go.Figure : (box_inf, box_ill, hist_inf, hist_ill, cdf_inf, cdf_ill)
+    """
+    fig_box_inf = go.Figure()
+    for result in all_results:
+        fig_box_inf.add_trace(go.Box(
+            y=result['infections_distribution'],
+            name=result['site_name'],
+            boxmean='sd'
+        ))
+    fig_box_inf.update_layout(
+        title="Infections Distribution by Site",
+        yaxis_title="Number of Infections",
+        showlegend=False
+    )
+
+    fig_box_ill = go.Figure()
+    for result in all_results:
+        fig_box_ill.add_trace(go.Box(
+            y=result['illness_distribution'],
+            name=result['site_name'],
+            boxmean='sd'
+        ))
+    fig_box_ill.update_layout(
+        title="Illness Distribution by Site",
+        yaxis_title="Number of Illness Cases",
+        showlegend=False
+    )
+
+    fig_hist_inf = go.Figure()
+    for trace in histogram_bar_traces(all_results, 'infections_distribution'):
+        fig_hist_inf.add_trace(trace)
+    fig_hist_inf.update_layout(
+        title="Infections Distribution (All Sites)",
+        xaxis_title="Number of Infections",
+        yaxis_title="Frequency",
+        barmode='overlay',
+        bargap=0
+    )
+
+    fig_hist_ill = go.Figure()
+    for trace in histogram_bar_traces(all_results, 'illness_distribution'):
+        fig_hist_ill.add_trace(trace)
+    fig_hist_ill.update_layout(
+        title="Illness Distribution (All Sites)",
+        xaxis_title="Number of Illness Cases",
+        yaxis_title="Frequency",
+        barmode='overlay',
+        bargap=0
+    )
+
+    fig_cdf_inf = go.Figure()
+    for trace in cdf_scatter_traces(all_results, 'infections_distribution'):
+        fig_cdf_inf.add_trace(trace)
+    fig_cdf_inf.update_layout(
+        title="CDF - Infections",
+        xaxis_title="Number of Infections",
+        yaxis_title="Cumulative Probability",
+        hovermode='x unified'
+    )
+
+    fig_cdf_ill = go.Figure()
+    for trace in cdf_scatter_traces(all_results, 'illness_distribution'):
+        fig_cdf_ill.add_trace(trace)
+    fig_cdf_ill.update_layout(
+        title="CDF - Illness",
+        xaxis_title="Number of Illness Cases",
+        yaxis_title="Cumulative Probability",
+        hovermode='x unified'
+    )
+
+    return fig_box_inf, fig_box_ill, fig_hist_inf, fig_hist_ill, fig_cdf_inf, fig_cdf_ill
+
+
+def paired_figure(fig_left, fig_right):
+    """
+    Two single-panel figures side by side as one make_subplots figure
+
+    One chart (one Plotly.js context) per infections/illness pair instead of two.
+    Traces are copied, so the source figures (embedded in the Word report) are
+    untouched. Site i keeps the same color in both panels and a single legend entry
+    """
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=(fig_left.layout.title.text, fig_right.layout.title.text)
+    )
+    colors = qualitative.Plotly
+    for col, panel in enumerate((fig_left, fig_right), 1):
+        for i, trace in enumerate(panel.data):
+            fig.add_trace(trace, row=1, col=col)
+            color = colors[i % len(colors)]
+            added = fig.data[-1]
+            added.update(legendgroup=trace.name, showlegend=(col == 1) and trace.showlegend is not False,
+                         marker_color=color)
+            if added.type == 'scatter':
+                added.update(line_color=color)
+        fig.update_xaxes(title_text=panel.layout.xaxis.title.text, row=1, col=col)
+        fig.update_yaxes(title_text=panel.layout.yaxis.title.text, row=1, col=col)
+
+    fig.update_layout(
+        barmode=fig_left.layout.barmode,
+        bargap=fig_left.layout.bargap,
+        hovermode=fig_left.layout.hovermode,
+        showlegend=fig_left.layout.showlegend
+    )
+    return fig
+
+
+@st.cache_resource
+def get_report_template():
+    """
+    Static Word report scaffold (styles + title page header) as .docx bytes
+
+    Note: Built once and re-opened per report, so each download skips
+    rebuilding the static title-page elements. Stored as bytes because
+    python-docx Documents do not survive copy.deepcopy intact
+    """
+    doc = Document()
+
+    # Title Page
+    title = doc.add_heading('Shellfish QMRA Analysis Report', 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    doc.add_paragraph()
+    p = doc.add_paragraph()
+    p.add_run('NIWA - Quantitative Microbial Risk Assessment').bold = True
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    template_io = io.BytesIO()
+    doc.save(template_io)
+    return template_io.getvalue()
+
+
 def generate_word_report(display_df, percentile_df, all_results, quality_report=None,
                          fig_bar=None, fig_box_inf=None, fig_box_ill=None,
                          fig_hist_inf=None, fig_hist_ill=None, fig_cdf_inf=None, fig_cdf_ill=None):
@@ -581,17 +1289,8 @@ def generate_word_report(display_df, percentile_df, all_results, quality_report=
     --------
     BytesIO : Word document in memory
     """
-    # Create document
-    doc = Document()
-
-    # Title Page
-    title = doc.add_heading('Shellfish QMRA Analysis Report', 0)
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    doc.add_paragraph()
-    p = doc.add_paragraph()
-    p.add_run('NIWA - Quantitative Microbial Risk Assessment').bold = True
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    # Create document from the cached title-page template
+    doc = Document(io.BytesIO(get_report_template()))
 
     p = doc.add_paragraph()
     p.add_run(f'Generated: {datetime.now().strftime("%Y-%m-%d %H:%M")}').italic = True
@@ -637,10 +1336,10 @@ def generate_word_report(display_df, percentile_df, all_results, quality_report=
         cell.text = str(column)
         cell.paragraphs[0].runs[0].font.bold = True
 
-    # Data rows
-    for i, (_, row) in enumerate(display_df.iterrows(), 1):
-        for j, value in enumerate(row):
-            table.rows[i].cells[j].text = f"{value:.2f}" if isinstance(value, (int, float)) else str(value)
+    # Data rows: fetch each row's cells once, values as plain Python scalars
+    for table_row, row in zip(table.rows[1:], display_df.itertuples(index=False)):
+        for cell, value in zip(table_row.cells, row):
+            cell.text = f"{value:.2f}" if isinstance(value, (int, float)) else str(value)
 
     doc.add_paragraph()
     doc.add_paragraph(
@@ -666,10 +1365,10 @@ def generate_word_report(display_df, percentile_df, all_results, quality_report=
         cell.text = str(column)
         cell.paragraphs[0].runs[0].font.bold = True
 
-    # Data rows
-    for i, (_, row) in enumerate(percentile_df.iterrows(), 1):
-        for j, value in enumerate(row):
-            perc_table.rows[i].cells[j].text = f"{value:.1f}" if isinstance(value, (int, float)) else str(value)
+    # Data rows: fetch each row's cells once, values as plain Python scalars
+    for table_row, row in zip(perc_table.rows[1:], percentile_df.itertuples(index=False)):
+        for cell, value in zip(table_row.cells, row):
+            cell.text = f"{value:.1f}" if isinstance(value, (int, float)) else str(value)
 
     doc.add_page_break()
 
@@ -681,45 +1380,66 @@ def generate_word_report(display_df, percentile_df, all_results, quality_report=
     )
     doc.add_paragraph()
 
-    # Helper function to embed plotly figures as images
-    def add_plotly_figure(figure, title, width_inches=6.0):
-        """Add a plotly figure to the Word document as an image"""
-        if figure is None:
-            return
-
-        try:
-            # Try to convert plotly figure to image bytes
-            import plotly.io as pio
-            img_bytes = pio.to_image(figure, format='png', width=800, height=500)
-
-            # Add image to document
-            doc.add_heading(title, 3)
-            img_stream = io.BytesIO(img_bytes)
-            doc.add_picture(img_stream, width=Inches(width_inches))
-            doc.add_paragraph()
+    # Render the figures to PNG
+    figures = [
+        (fig_bar, "Site Comparison - Mean Infections and Illness"),
+        (fig_box_inf, "Box Plot - Infections Distribution by Site"),
+        (fig_box_ill, "Box Plot - Illness Distribution by Site"),
+        (fig_hist_inf, "Histogram - Infections Distribution"),
+        (fig_hist_ill, "Histogram - Illness Distribution"),
+        (fig_cdf_inf, "Cumulative Distribution Function - Infections"),
+        (fig_cdf_ill, "Cumulative Distribution Function - Illness"),
+    ]
+    figures = [(figure, title) for figure, title in figures if figure is not None]
 
-        except ImportError:
+    def render_pngs(figures):
+        """PNG bytes for each plotly figure, or the exception raised by its export"""
+        import plotly.io as pio
+        if hasattr(pio, 'write_images'):
+            try:
+                # One kaleido session for the whole batch (plotly >= 6.1, kaleido >= 1)
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    paths = [os.path.join(tmpdir, f"figure_{i}.png") for i in range(len(figures))]
+                    pio.write_images(figures, paths, format='png', width=800, height=500)
+                    images = []
+                    for path in paths:
+                        with open(path, 'rb') as f:
+                            images.append(f.read())
+                    return images
+            except ValueError as e:
+                # No kaleido v1: without any kaleido every per-figure export fails the same
+                # way, so report this error; kaleido v0 still exports one by one below
+                if importlib.util.find_spec('kaleido') is None:
+                    return [e] * len(figures)
+            except Exception as e:
+                return [e] * len(figures)
+
+        # plotly < 6.1 (no write_images) or kaleido v0 - export one by one
+        images = []
+        for figure in figures:
+            try:
+                images.append(pio.to_image(figure, format='png', width=800, height=500))
+            except Exception as e:
+                images.append(e)
+        return images
+
+    rendered = render_pngs([figure for figure, _ in figures]) if figures else []
+
+    # Embed in report order
+    for (_, title), img_bytes in zip(figures, rendered):
+        doc.add_heading(title, 3)
+        if isinstance(img_bytes, ImportError):
             # kaleido not installed - add placeholder text
-            doc.add_heading(title, 3)
             doc.add_paragraph(
                 f"[Plot not embedded - kaleido package required for static image export. "
                 f"View this plot in the web application.]"
             )
-            doc.add_paragraph()
-        except Exception as e:
+        elif isinstance(img_bytes, Exception):
             # Any other error - add note
-            doc.add_heading(title, 3)
-            doc.add_paragraph(f"[Plot embedding failed: {str(e)}]")
-            doc.add_paragraph()
-
-    # Add all plots
-    add_plotly_figure(fig_bar, "Site Comparison - Mean Infections and Illness")
-    add_plotly_figure(fig_box_inf, "Box Plot - Infections Distribution by Site")
-    add_plotly_figure(fig_box_ill, "Box Plot - Illness Distribution by Site")
-    add_plotly_figure(fig_hist_inf, "Histogram - Infections Distribution")
-    add_plotly_figure(fig_hist_ill, "Histogram - Illness Distribution")
-    add_plotly_figure(fig_cdf_inf, "Cumulative Distribution Function - Infections")
-    add_plotly_figure(fig_cdf_ill, "Cumulative Distribution Function - Illness")
+            doc.add_paragraph(f"[Plot embedding failed: {str(img_bytes)}]")
+        else:
+            doc.add_picture(io.BytesIO(img_bytes), width=Inches(6.0))
+        doc.add_paragraph()
 
     doc.add_page_break()
 
@@ -824,10 +1544,13 @@ def main():
         st.markdown(f"- Effluent: **Hockey-stick** (95th percentile break)")
         st.markdown(f"- Dilution: **ECDF** (empirical sampling)")
 
-    # Hardcoded to David's preferred methods
-    use_variable_meal = True  # LogLogistic meal size
-    use_variable_baf = False  # Fixed BAF = 18.5
-    use_hockey_stick = True   # Hockey-stick for effluent (David's method)
+        st.markdown("**Sampling:**")
+        use_sobol = st.checkbox(
+            "Quasi-random (Sobol) sampling",
+            value=False,
+            help="Scrambled Sobol points for effluent and dilution draws. "
+                 "Iterations are rounded up to the next power of 2 (e.g. 10000 → 16384)."
+        )
 
     # ========================================================================
     # MAIN CONTENT - CSV-BASED ASSESSMENT
@@ -855,8 +1578,7 @@ def main():
             }
             sites_df_template = pd.DataFrame(sites_template)
             st.dataframe(sites_df_template, use_container_width=True)
-            csv = sites_df_template.to_csv(index=False)
-            st.download_button("⬇️ Download sites.csv", csv, "sites_template.csv", "text/csv")
+            st.download_button("⬇️ Download sites.csv", encode_csv(sites_df_template), "sites_template.csv", "text/csv")
 
         with col2:
             st.markdown("**2. Dilution Measurements** (long format)")
@@ -867,8 +1589,7 @@ def main():
             dilutions_df_template = pd.DataFrame(dilutions_template)
             st.dataframe(dilutions_df_template, use_container_width=True)
             st.caption("Add as many measurements as you have per site")
-            csv = dilutions_df_template.to_csv(index=False)
-            st.download_button("⬇️ Download dilutions.csv", csv, "dilutions_template.csv", "text/csv")
+            st.download_button("⬇️ Download dilutions.csv", encode_csv(dilutions_df_template), "dilutions_template.csv", "text/csv")
 
     # File uploads
     st.subheader("📤 Upload Data Files")
@@ -881,9 +1602,12 @@ def main():
         dilutions_file = st.file_uploader("Dilution measurements CSV", type=['csv'], key='dilutions')
 
     # Load data: uploaded files or default samples
+    sites_bytes = dilutions_bytes = None
     if sites_file and dilutions_file:
-        sites_df = pd.read_csv(sites_file)
-        dilutions_df = pd.read_csv(dilutions_file)
+        sites_bytes = sites_file.getvalue()
+        dilutions_bytes = dilutions_file.getvalue()
+        sites_df = load_csv(sites_bytes)
+        dilutions_df = load_csv(dilutions_bytes)
         data_source = "uploaded files"
     else:
         # Pre-load default sample data
@@ -891,8 +1615,12 @@ def main():
         dilutions_path = os.path.join(os.path.dirname(__file__), 'example_data', 'dilutions.csv')
 
         if os.path.exists(sites_path) and os.path.exists(dilutions_path):
-            sites_df = pd.read_csv(sites_path)
-            dilutions_df = pd.read_csv(dilutions_path)
+            with open(sites_path, 'rb') as f:
+                sites_bytes = f.read()
+            with open(dilutions_path, 'rb') as f:
+                dilutions_bytes = f.read()
+            sites_df = load_csv(sites_bytes)
+            dilutions_df = load_csv(dilutions_bytes)
             data_source = "pre-loaded examples (sites.csv + dilutions.csv)"
         else:
             sites_df = None
@@ -907,7 +1635,7 @@ def main():
         # DATA QUALITY CHECKER
         # ============================================================================
         with st.expander("🔍 Data Quality Report (Click to view)", expanded=False):
-            quality_report = check_data_quality(sites_df, dilutions_df)
+            quality_report = check_data_quality_csv(sites_bytes, dilutions_bytes)
 
             # Summary statistics
             st.markdown("### 📊 Summary")
@@ -969,48 +1697,72 @@ def main():
 
         if st.button("🚀 RUN QMRA", type="primary", use_container_width=True):
 
-            all_results = []
+            rng = get_rng()
+            timer = PhaseTimer()
             progress_bar = st.progress(0.0)
             status_text = st.empty()
 
-            for idx, row in sites_df.iterrows():
-                # Read all parameters from sites CSV
-                site_name = row['Site_Name']
+            # Dilution ECDF support per site (NaN-free, sorted), grouped once (O(1) lookup
+            # per site). The column is cast to float64 once (it passed the numeric check
+            # above); sites take row subsets
+            dilution_values = pd.to_numeric(dilutions_df['Dilution_Value']).to_numpy(dtype=np.float64)
+            dilution_groups = {
+                name: sorted_dilution_data(dilution_values[rows])
+                for name, rows in dilutions_df.groupby('Site_Name', sort=False).indices.items()
+            }
+
+            # Read all parameters from sites CSV as plain tuples (no per-row Series)
+            site_columns = [
+                'Site_Name', 'Effluent_Min', 'Effluent_Median', 'Effluent_Max',
+                'WWTP_Log_Removal', 'Meal_Size_g', 'Num_People', 'Iterations'
+            ]
+            sites = []
+            for (site_name, effluent_min, effluent_median, effluent_max, log_removal_wwtp,
+                 meal_size_fixed, num_people, iterations) in sites_df[site_columns].itertuples(index=False, name=None):
 
-                # Extract dilution data for this site from dilutions CSV
-                site_dilutions = dilutions_df[dilutions_df['Site_Name'] == site_name]['Dilution_Value'].values
-                if len(site_dilutions) == 0:
+                # Dilution data for this site from dilutions CSV
+                dilution_data = dilution_groups.get(site_name)
+                if dilution_data is None or dilution_data.size == 0:
                     st.warning(f"⚠️ No dilution data found for {site_name}. Skipping...")
                     continue
-                dilution_data = site_dilutions.astype(float)
-
-                effluent_min = row['Effluent_Min']
-                effluent_median = row['Effluent_Median']
-                effluent_max = row['Effluent_Max']
-                log_removal_wwtp = row['WWTP_Log_Removal']
-                meal_size_fixed = row['Meal_Size_g']
-                num_people = int(row['Num_People'])
-                iterations = int(row['Iterations'])
-
-                status_text.text(f"Processing {idx+1}/{len(sites_df)}: {site_name}...")
-                progress_bar.progress(idx / len(sites_df))
-
-                results = run_shellfish_qmra_advanced(
-                    site_name, dilution_data, effluent_min, effluent_median, effluent_max,
-                    log_removal_wwtp, num_people, iterations,
-                    mode='advanced' if use_variable_meal else 'simple',
-                    meal_size_fixed=meal_size_fixed,
-                    mhf_fixed=MHF_MEAN,
-                    use_hockey_stick=use_hockey_stick,
-                    use_variable_baf=use_variable_baf,
-                    progress_bar=None
-                )
 
-                all_results.append(results)
+                sites.append({
+                    'site_name': site_name,
+                    'dilution_data': dilution_data,
+                    'presorted_dilution': True,
+                    'effluent_min': effluent_min,
+                    'effluent_median': effluent_median,
+                    'effluent_max': effluent_max,
+                    'log_removal_wwtp': log_removal_wwtp,
+                    'meal_size_fixed': meal_size_fixed,
+                    'num_people': int(num_people),
+                    # Sobol points are only balanced in power-of-2 sets: round up
+                    'iterations': 1 << (int(iterations) - 1).bit_length() if use_sobol else int(iterations),
+                })
+
+            # All sites in one batched run (the per-person shards of all sites share one
+            # thread pool); the progress bar advances as each site completes
+            status_text.text(f"Processing {len(sites)} site(s)...")
+            all_results = run_shellfish_qmra_david(
+                sites, use_sobol=use_sobol, progress_bar=progress_bar, rng=rng, timer=timer
+            )
 
-            progress_bar.progress(1.0)
             status_text.text("✅ Complete!")
 
+            # Keep the run across reruns (e.g. download clicks) until the input files change
+            st.session_state['qmra_run'] = {
+                'input_key': hash((sites_bytes, dilutions_bytes, use_sobol)),
+                'results': all_results,
+                'timer': timer,
+            }
+
+        qmra_run = st.session_state.get('qmra_run')
+        if qmra_run is not None and qmra_run['input_key'] == hash((sites_bytes, dilutions_bytes, use_sobol)):
+            all_results = qmra_run['results']
+            # Simulation timings are shown once, with the render that follows the run
+            timer = qmra_run.pop('timer', None) or PhaseTimer()
+            timer.reset()
+
             # Results
             st.markdown("---")
             st.header("📊 Results - All Sites")
@@ -1037,192 +1789,126 @@ def main():
             # Chart - Bar comparison
             st.subheader("📊 Site Comparison - Mean Values")
             fig = go.Figure()
-            fig.add_trace(go.Bar(x=display_df['Site'], y=display_df['Mean Infections'], name='Infections', marker_color='steelblue'))
-            fig.add_trace(go.Bar(x=display_df['Site'], y=display_df['Mean Illness'], name='Illness', marker_color='coral'))
-            fig.update_layout(title=f"Site Comparison ({num_people} people)", xaxis_title="Site", yaxis_title="Number of People", barmode='group')
+            fig.add_trace(go.Bar(x=display_df['Site'].to_numpy(), y=display_df['Mean Infections'].to_numpy(), name='Infections', marker_color='steelblue'))
+            fig.add_trace(go.Bar(x=display_df['Site'].to_numpy(), y=display_df['Mean Illness'].to_numpy(), name='Illness', marker_color='coral'))
+            fig.update_layout(title=f"Site Comparison ({all_results[-1]['num_people']} people)", xaxis_title="Site", yaxis_title="Number of People", barmode='group')
             st.plotly_chart(fig, use_container_width=True)
 
             # Detailed Percentile Table
             st.subheader("📈 Detailed Statistics - All Percentiles")
+            table_percentiles = [5, 25, 50, 75, 95, 99]
             percentile_data = []
             for result in all_results:
-                infections_dist = result['infections_distribution']
-                illness_dist = result['illness_distribution']
-                percentile_data.append({
-                    'Site': result['site_name'],
-                    'Inf_5th': np.percentile(infections_dist, 5),
-                    'Inf_25th': np.percentile(infections_dist, 25),
-                    'Inf_50th': np.percentile(infections_dist, 50),
-                    'Inf_75th': np.percentile(infections_dist, 75),
-                    'Inf_95th': np.percentile(infections_dist, 95),
-                    'Inf_99th': np.percentile(infections_dist, 99),
-                    'Ill_5th': np.percentile(illness_dist, 5),
-                    'Ill_25th': np.percentile(illness_dist, 25),
-                    'Ill_50th': np.percentile(illness_dist, 50),
-                    'Ill_75th': np.percentile(illness_dist, 75),
-                    'Ill_95th': np.percentile(illness_dist, 95),
-                    'Ill_99th': np.percentile(illness_dist, 99),
-                })
+                # One partition pass for all percentiles of both distributions
+                inf_pcts, ill_pcts = np.percentile(
+                    np.stack([result['infections_distribution'], result['illness_distribution']]),
+                    table_percentiles, axis=1
+                ).T
+                row = {'Site': result['site_name']}
+                row.update({f'Inf_{q}th': value for q, value in zip(table_percentiles, inf_pcts)})
+                row.update({f'Ill_{q}th': value for q, value in zip(table_percentiles, ill_pcts)})
+                percentile_data.append(row)
             percentile_df = pd.DataFrame(percentile_data)
             st.dataframe(percentile_df, hide_index=True, use_container_width=True)
 
-            # Box Plot Comparison
-            st.subheader("📦 Distribution Comparison - Box Plots")
-            col1, col2 = st.columns(2)
-
-            with col1:
-                fig_box_inf = go.Figure()
-                for result in all_results:
-                    fig_box_inf.add_trace(go.Box(
-                        y=result['infections_distribution'],
-                        name=result['site_name'],
-                        boxmean='sd'
-                    ))
-                fig_box_inf.update_layout(
-                    title="Infections Distribution by Site",
-                    yaxis_title="Number of Infections",
-                    showlegend=False
-                )
-                st.plotly_chart(fig_box_inf, use_container_width=True)
-
-            with col2:
-                fig_box_ill = go.Figure()
-                for result in all_results:
-                    fig_box_ill.add_trace(go.Box(
-                        y=result['illness_distribution'],
-                        name=result['site_name'],
-                        boxmean='sd'
-                    ))
-                fig_box_ill.update_layout(
-                    title="Illness Distribution by Site",
-                    yaxis_title="Number of Illness Cases",
-                    showlegend=False
-                )
-                st.plotly_chart(fig_box_ill, use_container_width=True)
-
-            # Histogram/Density Plots
-            st.subheader("📊 Distribution Histograms")
-            col1, col2 = st.columns(2)
-
-            with col1:
-                fig_hist_inf = go.Figure()
-                for result in all_results:
-                    fig_hist_inf.add_trace(go.Histogram(
-                        x=result['infections_distribution'],
-                        name=result['site_name'],
-                        opacity=0.7,
-                        nbinsx=30
-                    ))
-                fig_hist_inf.update_layout(
-                    title="Infections Distribution (All Sites)",
-                    xaxis_title="Number of Infections",
-                    yaxis_title="Frequency",
-                    barmode='overlay'
-                )
-                st.plotly_chart(fig_hist_inf, use_container_width=True)
-
-            with col2:
-                fig_hist_ill = go.Figure()
-                for result in all_results:
-                    fig_hist_ill.add_trace(go.Histogram(
-                        x=result['illness_distribution'],
-                        name=result['site_name'],
-                        opacity=0.7,
-                        nbinsx=30
-                    ))
-                fig_hist_ill.update_layout(
-                    title="Illness Distribution (All Sites)",
-                    xaxis_title="Number of Illness Cases",
-                    yaxis_title="Frequency",
-                    barmode='overlay'
-                )
-                st.plotly_chart(fig_hist_ill, use_container_width=True)
-
-            # Cumulative Distribution Function (CDF) Plots
-            st.subheader("📈 Cumulative Distribution Functions (CDF)")
-            col1, col2 = st.columns(2)
-
-            with col1:
-                fig_cdf_inf = go.Figure()
-                for result in all_results:
-                    sorted_data = np.sort(result['infections_distribution'])
-                    cdf = np.arange(1, len(sorted_data) + 1) / len(sorted_data)
-                    fig_cdf_inf.add_trace(go.Scatter(
-                        x=sorted_data,
-                        y=cdf,
-                        name=result['site_name'],
-                        mode='lines'
-                    ))
-                fig_cdf_inf.update_layout(
-                    title="CDF - Infections",
-                    xaxis_title="Number of Infections",
-                    yaxis_title="Cumulative Probability",
-                    hovermode='x unified'
+            # Detailed per-site distribution plots are opt-in for large site counts, where
+            # a single percentile heatmap is shown instead. The figures are only built when
+            # shown or when the run's Word report (which embeds them) is still to be rendered
+            show_detailed_plots = st.checkbox(
+                "Show detailed per-site distribution plots", value=len(all_results) <= 10
+            )
+            if show_detailed_plots or 'word_report' not in qmra_run:
+                (fig_box_inf, fig_box_ill, fig_hist_inf, fig_hist_ill,
+                 fig_cdf_inf, fig_cdf_ill) = distribution_figures(all_results)
+
+            if show_detailed_plots:
+                # Infections / illness pairs as one two-panel chart each
+                # Box Plot Comparison
+                st.subheader("📦 Distribution Comparison - Box Plots")
+                st.plotly_chart(paired_figure(fig_box_inf, fig_box_ill), use_container_width=True)
+
+                # Histogram/Density Plots
+                st.subheader("📊 Distribution Histograms")
+                st.plotly_chart(paired_figure(fig_hist_inf, fig_hist_ill), use_container_width=True)
+
+                # Cumulative Distribution Function (CDF) Plots
+                st.subheader("📈 Cumulative Distribution Functions (CDF)")
+                st.plotly_chart(paired_figure(fig_cdf_inf, fig_cdf_ill), use_container_width=True)
+            else:
+                # Percentile summary heatmap (one row per site)
+                st.subheader("🌡️ Percentile Summary - All Sites")
+                heatmap_columns = ['Inf_5th', 'Inf_50th', 'Inf_95th', 'Ill_5th', 'Ill_50th', 'Ill_95th']
+                fig_heatmap = go.Figure(go.Heatmap(
+                    z=percentile_df[heatmap_columns].to_numpy(),
+                    x=heatmap_columns,
+                    y=percentile_df['Site'].to_numpy(),
+                    colorscale='Reds',
+                    colorbar_title="People"
+                ))
+                fig_heatmap.update_layout(
+                    title="Infection and Illness Percentiles by Site",
+                    height=max(400, 20 * len(percentile_df))
                 )
-                st.plotly_chart(fig_cdf_inf, use_container_width=True)
+                st.plotly_chart(fig_heatmap, use_container_width=True)
 
-            with col2:
-                fig_cdf_ill = go.Figure()
-                for result in all_results:
-                    sorted_data = np.sort(result['illness_distribution'])
-                    cdf = np.arange(1, len(sorted_data) + 1) / len(sorted_data)
-                    fig_cdf_ill.add_trace(go.Scatter(
-                        x=sorted_data,
-                        y=cdf,
-                        name=result['site_name'],
-                        mode='lines'
-                    ))
-                fig_cdf_ill.update_layout(
-                    title="CDF - Illness",
-                    xaxis_title="Number of Illness Cases",
-                    yaxis_title="Cumulative Probability",
-                    hovermode='x unified'
-                )
-                st.plotly_chart(fig_cdf_ill, use_container_width=True)
+            timer.lap('plotting')
 
             # Download Options
             st.subheader("📥 Download Results")
             col1, col2, col3, col4 = st.columns(4)
 
+            # CSV exports encoded once per run and kept with it, so reruns neither
+            # re-encode nor re-hash the tables
+            if 'csv_exports' not in qmra_run:
+                # Full iteration data, built column-wise from the result arrays
+                site_iterations = [result['infections_distribution'].size for result in all_results]
+                iteration_numbers = np.arange(1, max(site_iterations) + 1)  # Sliced per site
+                iteration_df = pd.DataFrame({
+                    'Site': np.repeat([result['site_name'] for result in all_results], site_iterations),
+                    'Iteration': np.concatenate([iteration_numbers[:n] for n in site_iterations]),
+                    'Infections': np.concatenate([result['infections_distribution'] for result in all_results]),
+                    'Illness': np.concatenate([result['illness_distribution'] for result in all_results]),
+                })
+                qmra_run['csv_exports'] = {
+                    'summary': encode_csv(display_df),
+                    'percentiles': encode_csv(percentile_df),
+                    'iterations': encode_csv(iteration_df),
+                }
+            csv_exports = qmra_run['csv_exports']
+
             with col1:
                 # Summary CSV
-                csv = display_df.to_csv(index=False)
-                st.download_button("📄 Download Summary CSV", csv, "summary_results.csv", "text/csv", use_container_width=True)
+                st.download_button("📄 Download Summary CSV", csv_exports['summary'], "summary_results.csv", "text/csv", use_container_width=True)
 
             with col2:
                 # Percentile CSV
-                percentile_csv = percentile_df.to_csv(index=False)
-                st.download_button("📊 Download Percentiles CSV", percentile_csv, "percentile_results.csv", "text/csv", use_container_width=True)
+                st.download_button("📊 Download Percentiles CSV", csv_exports['percentiles'], "percentile_results.csv", "text/csv", use_container_width=True)
 
             with col3:
                 # Full iteration data
-                iteration_data = []
-                for result in all_results:
-                    for i in range(len(result['infections_distribution'])):
-                        iteration_data.append({
-                            'Site': result['site_name'],
-                            'Iteration': i + 1,
-                            'Infections': result['infections_distribution'][i],
-                            'Illness': result['illness_distribution'][i]
-                        })
-                iteration_df = pd.DataFrame(iteration_data)
-                iteration_csv = iteration_df.to_csv(index=False)
-                st.download_button("💾 Download Full Iteration Data", iteration_csv, "full_iteration_data.csv", "text/csv", use_container_width=True)
+                st.download_button("💾 Download Full Iteration Data", csv_exports['iterations'], "full_iteration_data.csv", "text/csv", use_container_width=True)
 
             with col4:
-                # Word Report (pass all figures)
-                quality_report = None  # Can be retrieved from earlier if data quality check was run
-                word_doc = generate_word_report(
-                    display_df, percentile_df, all_results, quality_report,
-                    fig_bar=fig,
-                    fig_box_inf=fig_box_inf,
-                    fig_box_ill=fig_box_ill,
-                    fig_hist_inf=fig_hist_inf,
-                    fig_hist_ill=fig_hist_ill,
-                    fig_cdf_inf=fig_cdf_inf,
-                    fig_cdf_ill=fig_cdf_ill
-                )
-                st.download_button("📑 Download Word Report", word_doc, "qmra_report.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", use_container_width=True)
+                # Word Report (pass all figures) - rendered once per run, then reused on reruns
+                if 'word_report' not in qmra_run:
+                    qmra_run['word_report'] = generate_word_report(
+                        display_df, percentile_df, all_results,
+                        quality_report,  # From the Data Quality check on these inputs
+                        fig_bar=fig,
+                        fig_box_inf=fig_box_inf,
+                        fig_box_ill=fig_box_ill,
+                        fig_hist_inf=fig_hist_inf,
+                        fig_hist_ill=fig_hist_ill,
+                        fig_cdf_inf=fig_cdf_inf,
+                        fig_cdf_ill=fig_cdf_ill
+                    ).getvalue()
+                st.download_button("📑 Download Word Report", qmra_run['word_report'], "qmra_report.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", use_container_width=True)
+
+            timer.lap('exports')
+
+            # Performance breakdown (all sites)
+            with st.expander("⏱️ Performance Timings (Click to expand)"):
+                st.dataframe(timer.to_dataframe(), hide_index=True, use_container_width=True)
 
     else:
         st.warning("⚠️ No data available. Sample data file not found. Please upload a CSV file above.")